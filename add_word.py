@@ -2,57 +2,230 @@
 
 import json
 import csv
+import sqlite3
+import mmap
 import argparse
 from pathlib import Path
+from multiprocessing import Pool
+import os
 import sys
 
-from wiktionary_to_anki import process_entry, combine_entries, load_frequency_data_for_words, get_frequency_rank
+from wiktionary_to_anki import process_entry, combine_entries, load_frequency_data_for_words, get_frequency_rank, json_loads, open_jsonl, is_compressed, split_file, FIELDNAMES
 
-def find_words_in_wiktionary(words, wiktionary_file):
-    target_words = {word.lower(): word for word in words}
-    found_entries = {word: [] for word in words}
+SEARCH_BLOCK_SIZE = 1 << 20
+
+def word_needles(target_words):
+    needles = set()
+    for word in target_words:
+        for variant in (word, word.upper(), word.title(), word.capitalize()):
+            for ensure_ascii in (False, True):
+                encoded = json.dumps(variant, ensure_ascii=ensure_ascii)[1:-1]
+                needles.add(encoded.encode('utf-8').lower())
+    return tuple(needles)
+
+def init_search_worker(target_words):
+    global search_targets, search_needles
+    search_targets = target_words
+    search_needles = word_needles(target_words)
+
+def next_line_start(data, position):
+    if position <= 0:
+        return 0
+    newline = data.find(b'\n', position - 1)
+    return len(data) if newline < 0 else newline + 1
+
+def matching_lines(block, needles):
+    block_lower = block.lower()
+    lines = set()
+    for needle in needles:
+        hit = block_lower.find(needle)
+        while hit >= 0:
+            line_start = block.rfind(b'\n', 0, hit) + 1
+            line_end = block.find(b'\n', hit)
+            if line_end < 0:
+                line_end = len(block)
+            lines.add((line_start, line_end))
+            hit = block_lower.find(needle, line_end + 1)
+    return sorted(lines)
+
+def search_block(block, target_words, needles):
+    matches = []
+    for line_start, line_end in matching_lines(block, needles):
+        try:
+            entry = json_loads(block[line_start:line_end])
+            word = entry.get('word', '')
+            if word not in target_words:
+                word = word.lower()
+            if word in target_words:
+                matches.append((target_words[word], entry))
+        except json.JSONDecodeError:
+            continue
+    return matches
+
+def search_chunk(chunk):
+    path, start, end = chunk
+    line_count = 0
+    matches = []
+    
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        position = next_line_start(mm, start)
+        end = next_line_start(mm, end)
+        
+        while position < end:
+            block_end = min(next_line_start(mm, position + SEARCH_BLOCK_SIZE), end)
+            block = mm[position:block_end]
+            position = block_end
+            line_count += block.count(b'\n') + (not block.endswith(b'\n'))
+            
+            matches.extend(search_block(block, search_targets, search_needles))
     
-    print(f"Searching for {len(words)} words in {wiktionary_file}...")
+    return line_count, matches
+
+def index_is_current(wiktionary_file, index_file):
+    if not Path(index_file).exists():
+        return False
+    stat = os.stat(wiktionary_file)
+    conn = sqlite3.connect(str(index_file))
+    try:
+        source = dict(conn.execute("SELECT key, value FROM source"))
+    except sqlite3.Error:
+        return False
+    finally:
+        conn.close()
+    return source.get('mtime_ns') == str(stat.st_mtime_ns) and source.get('size') == str(stat.st_size)
+
+def build_index(wiktionary_file, index_file):
+    print(f"Building index {index_file} from {wiktionary_file}...")
+    
+    stat = os.stat(wiktionary_file)
+    temp_file = Path(f"{index_file}.tmp")
+    if temp_file.exists():
+        temp_file.unlink()
     
-    with open(wiktionary_file, 'r', encoding='utf-8') as f:
+    conn = sqlite3.connect(str(temp_file))
+    conn.execute('PRAGMA synchronous=OFF')
+    conn.execute('PRAGMA journal_mode=OFF')
+    conn.execute('CREATE TABLE entries (word_lower TEXT NOT NULL, line BLOB NOT NULL)')
+    conn.execute('CREATE TABLE source (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+    
+    indexed_count = 0
+    with open_jsonl(wiktionary_file) as f:
+        rows = []
         for line_num, line in enumerate(f, 1):
-            if line_num % 100000 == 0:
-                print(f"  Searched {line_num:,} entries...")
-                found_count = sum(len(entries) for entries in found_entries.values())
-                print(f"  Found {found_count} entries so far...")
-            
             try:
-                entry = json.loads(line.strip())
-                word_lower = entry.get('word', '').lower()
-                if word_lower in target_words:
-                    original_word = target_words[word_lower]
-                    found_entries[original_word].append(entry)
+                entry = json_loads(line)
             except json.JSONDecodeError:
                 continue
+            rows.append((entry.get('word', '').lower(), line.rstrip(b'\n')))
+            if len(rows) >= 10000:
+                conn.executemany('INSERT INTO entries VALUES (?, ?)', rows)
+                indexed_count += len(rows)
+                rows.clear()
+            if line_num % 100000 == 0:
+                print(f"  Indexed {line_num:,} entries...")
+        conn.executemany('INSERT INTO entries VALUES (?, ?)', rows)
+        indexed_count += len(rows)
     
-    for word in words:
-        print(f"Found {len(found_entries[word])} entries for '{word}'")
+    conn.execute('CREATE INDEX ix_entries_word_lower ON entries (word_lower)')
+    conn.executemany('INSERT INTO source VALUES (?, ?)', [
+        ('mtime_ns', str(stat.st_mtime_ns)),
+        ('size', str(stat.st_size))
+    ])
+    conn.commit()
+    conn.close()
+    os.replace(str(temp_file), str(index_file))
+    
+    print(f"Indexed {indexed_count:,} entries")
+
+def iter_index_matches(target_words, index_file):
+    conn = sqlite3.connect(str(index_file))
+    try:
+        for word_lower, original_word in target_words.items():
+            cursor = conn.execute(
+                'SELECT line FROM entries WHERE word_lower = ? ORDER BY rowid', (word_lower,))
+            for (line,) in cursor:
+                yield original_word, json_loads(line)
+    finally:
+        conn.close()
+
+def iter_stream_matches(target_words, wiktionary_file):
+    needles = word_needles(target_words)
+    searched_count = 0
+    found_count = 0
+    pending = b''
     
-    return found_entries
+    with open_jsonl(wiktionary_file) as f:
+        while pending is not None:
+            data = f.read(SEARCH_BLOCK_SIZE)
+            if data:
+                data = pending + data
+                split = data.rfind(b'\n') + 1
+                block, pending = data[:split], data[split:]
+            else:
+                block, pending = pending, None
+            if not block:
+                continue
+            
+            line_count = block.count(b'\n') + (not block.endswith(b'\n'))
+            matches = search_block(block, target_words, needles)
+            found_count += len(matches)
+            yield from matches
+            
+            if (searched_count + line_count) // 100000 > searched_count // 100000:
+                print(f"  Searched {searched_count + line_count:,} entries...")
+                print(f"  Found {found_count} entries so far...")
+            searched_count += line_count
+
+def iter_scan_matches(target_words, wiktionary_file, processes=None):
+    if is_compressed(wiktionary_file):
+        yield from iter_stream_matches(target_words, wiktionary_file)
+        return
+    
+    chunks = split_file(wiktionary_file, (processes or os.cpu_count() or 1) * 4)
+    searched_count = 0
+    found_count = 0
+    with Pool(processes, initializer=init_search_worker, initargs=(target_words,)) as pool:
+        for line_count, matches in pool.imap(search_chunk, chunks):
+            searched_count += line_count
+            found_count += len(matches)
+            yield from matches
+            print(f"  Searched {searched_count:,} entries...")
+            print(f"  Found {found_count} entries so far...")
+
+def iter_matches(words, wiktionary_file, processes=None, index_file=None):
+    target_words = {word.lower(): word for word in words}
+    
+    if index_file:
+        if not index_is_current(wiktionary_file, index_file):
+            build_index(wiktionary_file, index_file)
+        print(f"Looking up {len(words)} words in {index_file}...")
+        yield from iter_index_matches(target_words, index_file)
+    else:
+        print(f"Searching for {len(words)} words in {wiktionary_file}...")
+        yield from iter_scan_matches(target_words, wiktionary_file, processes)
 
-def process_words_to_cards(words, wiktionary_file="kaikki.org-dictionary-English.jsonl"):
-    all_entries = find_words_in_wiktionary(words, wiktionary_file)
+def process_words_to_cards(words, wiktionary_file="kaikki.org-dictionary-English.jsonl", processes=None, index_file=None):
+    entry_counts = {word: 0 for word in words}
+    processed = {word: [] for word in words}
+    
+    for word, entry in iter_matches(words, wiktionary_file, processes, index_file):
+        entry_counts[word] += 1
+        card_data = process_entry(entry)
+        if card_data:
+            processed[word].append(card_data)
+    
+    for word in words:
+        print(f"Found {entry_counts[word]} entries for '{word}'")
+    
     frequency_dict = load_frequency_data_for_words(set(words))
     cards = []
     
     for word in words:
-        entries = all_entries[word]
-        
-        if not entries:
+        if not entry_counts[word]:
             print(f"Word '{word}' not found in Wiktionary data")
             continue
         
-        processed_entries = []
-        for entry in entries:
-            card_data = process_entry(entry)
-            if card_data:
-                processed_entries.append(card_data)
-        
+        processed_entries = processed[word]
         if not processed_entries:
             print(f"No valid card data could be created for '{word}'")
             continue
@@ -70,33 +243,32 @@ def process_words_to_cards(words, wiktionary_file="kaikki.org-dictionary-English
     
     return cards
 
-def create_card_for_word(word, wiktionary_file="kaikki.org-dictionary-English.jsonl", output_file=None):
-    cards = process_words_to_cards([word], wiktionary_file)
+def print_card(card_data):
+    print(f"\nCard for '{card_data['Front']}':")
+    print(f"Front: {card_data['Front']}")
+    print(f"Back: {card_data['Back'][:200]}...")
+    print(f"Part of Speech: {card_data['Part of Speech']}")
+    print(f"IPA: {card_data['IPA']}")
+    print(f"Frequency: {card_data['Frequency']}")
+    print(f"Etymology: {card_data['Etymology'][:100]}...")
+
+def create_card_for_word(word, wiktionary_file="kaikki.org-dictionary-English.jsonl", output_file=None, processes=None, index_file=None, writer=None):
+    cards = process_words_to_cards([word], wiktionary_file, processes, index_file)
     
     if not cards:
         return None
     
     card_data = cards[0]
     
-    if output_file:
-        fieldnames = [
-            'Front', 'Back', 'Part of Speech', 'IPA', 'Audio', 
-            'Etymology', 'Forms', 'Hyphenation', 'Tags', 'Frequency'
-        ]
-        
+    if writer:
+        writer.writerow(card_data)
+    elif output_file:
         with open(output_file, 'a', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            writer.writerow(card_data)
+            csv.DictWriter(f, fieldnames=FIELDNAMES).writerow(card_data)
         
         print(f"Card saved to {output_file}")
     else:
-        print(f"\nCard for '{card_data['Front']}':")
-        print(f"Front: {card_data['Front']}")
-        print(f"Back: {card_data['Back'][:200]}...")
-        print(f"Part of Speech: {card_data['Part of Speech']}")
-        print(f"IPA: {card_data['IPA']}")
-        print(f"Frequency: {card_data['Frequency']}")
-        print(f"Etymology: {card_data['Etymology'][:100]}...")
+        print_card(card_data)
     
     return card_data
 
@@ -107,6 +279,10 @@ def main():
                        help='Wiktionary JSONL file')
     parser.add_argument('-o', '--output', 
                        help='Output CSV file (if not specified, prints to stdout)')
+    parser.add_argument('-j', '--jobs', type=int,
+                       help='Number of worker processes for the search (default: CPU count)')
+    parser.add_argument('--index',
+                       help='SQLite index of the JSONL file for fast lookups (built or rebuilt when needed)')
     
     args = parser.parse_args()
     
@@ -114,25 +290,20 @@ def main():
         print(f"Error: Input file {args.input} not found")
         return 1
     
-    if args.output and len(args.words) > 1:
-        all_cards = process_words_to_cards(args.words, args.input)
-        
+    all_cards = process_words_to_cards(args.words, args.input, args.jobs, args.index)
+    
+    if args.output:
         if all_cards:
-            fieldnames = [
-                'Front', 'Back', 'Part of Speech', 'IPA', 'Audio', 
-                'Etymology', 'Forms', 'Hyphenation', 'Tags', 'Frequency'
-            ]
-            
-            with open(args.output, 'a', newline='', encoding='utf-8') as f:
-                writer = csv.DictWriter(f, fieldnames=fieldnames)
+            with open(args.output, 'a', newline='', encoding='utf-8', buffering=1 << 20) as f:
+                writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
                 writer.writerows(all_cards)
             
             print(f"Saved {len(all_cards)} cards to {args.output}")
         else:
             print("No valid cards found")
     else:
-        for word in args.words:
-            create_card_for_word(word, args.input, args.output if len(args.words) == 1 else None)
+        for card_data in all_cards:
+            print_card(card_data)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -5,9 +5,25 @@ import sqlite3
 import zipfile
 import tempfile
 import os
+from operator import itemgetter
 from pathlib import Path
 import time
 
+FIELDNAMES = [
+    'Front', 'Back', 'Part of Speech', 'IPA', 'Audio',
+    'Etymology', 'Forms', 'Hyphenation', 'Tags', 'Frequency'
+]
+
+INSERT_NOTE_SQL = (
+    "INSERT INTO notes (id, guid, mid, mod, usn, tags, flds, sfld, csum, flags, data) "
+    "VALUES (?, ?, ?, ?, 0, '', ?, ?, 0, 0, '')"
+)
+
+INSERT_CARD_SQL = (
+    "INSERT INTO cards (id, nid, did, ord, mod, usn, type, queue, due, ivl, factor, reps, lapses, left, odue, odid, flags, data) "
+    "VALUES (?, ?, ?, 0, ?, -1, 0, -1, ?, 0, 0, 0, 0, 0, 0, 0, 0, '')"
+)
+
 def create_anki_package(csv_file, output_file="english.apkg"):
     
     with tempfile.TemporaryDirectory() as temp_dir:
@@ -19,7 +35,7 @@ def create_anki_package(csv_file, output_file="english.apkg"):
         media_path = temp_path / "media"
         media_path.write_text("{}")
         
-        with zipfile.ZipFile(output_file, 'w', zipfile.ZIP_DEFLATED) as apkg:
+        with zipfile.ZipFile(output_file, 'w', zipfile.ZIP_DEFLATED, compresslevel=1) as apkg:
             apkg.write(db_path, "collection.anki2")
             apkg.write(media_path, "media")
     
@@ -27,21 +43,29 @@ def create_anki_package(csv_file, output_file="english.apkg"):
 
 def create_anki_database(db_path, csv_file):
     
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    
-    create_anki_schema(cursor)
+    conn = sqlite3.connect(':memory:')
+    conn.execute('PRAGMA temp_store=MEMORY')
     
-    note_type_id = insert_note_type(cursor)
-    
-    deck_id = insert_deck(cursor)
-    
-    insert_cards_from_csv(cursor, csv_file, note_type_id, deck_id)
+    with conn:
+        cursor = conn.cursor()
+        
+        create_anki_tables(cursor)
+        
+        note_type_id = insert_note_type(cursor)
+        
+        deck_id = insert_deck(cursor)
+        
+        insert_cards_from_csv(cursor, csv_file, note_type_id, deck_id)
+        
+        create_anki_indices(cursor)
     
-    conn.commit()
+    disk = sqlite3.connect(db_path)
+    disk.execute('PRAGMA synchronous=OFF')
+    conn.backup(disk)
+    disk.close()
     conn.close()
 
-def create_anki_schema(cursor):
+def create_anki_tables(cursor):
     
     cursor.execute('''
         CREATE TABLE col (
@@ -121,6 +145,8 @@ def create_anki_schema(cursor):
             type INTEGER NOT NULL
         )
     ''')
+
+def create_anki_indices(cursor):
     
     cursor.execute('CREATE INDEX ix_notes_usn ON notes (usn)')
     cursor.execute('CREATE INDEX ix_cards_usn ON cards (usn)')
@@ -317,6 +343,14 @@ hr {
 def insert_deck(cursor):
     return 1
 
+def pad_row(row, width):
+    if len(row) < width:
+        row.extend([''] * (width - len(row)))
+    else:
+        del row[width:]
+    row.append('')
+    return row
+
 def insert_cards_from_csv(cursor, csv_file, note_type_id, deck_id):
     import csv
     
@@ -324,49 +358,48 @@ def insert_cards_from_csv(cursor, csv_file, note_type_id, deck_id):
         print(f"Warning: CSV file {csv_file} not found. Creating empty package.")
         return
     
+    notes_rows = []
+    cards_rows = []
+    
     with open(csv_file, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
+        reader = csv.reader(f)
+        header = next(reader, [])
+        columns = {name: i for i, name in enumerate(header)}
+        missing = len(header)
+        field_indexes = [columns.get(name, missing) for name in FIELDNAMES]
+        front_index = field_indexes[0]
+        get_fields = itemgetter(*field_indexes)
         
-        for i, row in enumerate(reader):
+        now = int(time.time())
+        base_note_id = int(time.time() * 1000)
+        
+        for i, row in enumerate(row for row in reader if row):
+            pad_row(row, missing)
                 
-            note_id = int(time.time() * 1000) + i
+            note_id = base_note_id + i
             card_id = note_id + 1000000
             
-            fields = '\x1f'.join([
-                row.get('Front', ''),
-                row.get('Back', ''),
-                row.get('Part of Speech', ''),
-                row.get('IPA', ''),
-                row.get('Audio', ''),
-                row.get('Etymology', ''),
-                row.get('Forms', ''),
-                row.get('Hyphenation', ''),
-                row.get('Tags', ''),
-                row.get('Frequency', '')
-            ])
+            fields = '\x1f'.join(get_fields(row))
             
-            cursor.execute('''
-                INSERT INTO notes (id, guid, mid, mod, usn, tags, flds, sfld, csum, flags, data)
-                VALUES (?, ?, ?, ?, 0, '', ?, ?, 0, 0, '')
-            ''', (
+            notes_rows.append((
                 note_id,
                 f"note_{note_id}",
                 note_type_id,
-                int(time.time()),
+                now,
                 fields,
-                row.get('Front', '')[:64]
+                row[front_index][:64]
             ))
             
-            cursor.execute('''
-                INSERT INTO cards (id, nid, did, ord, mod, usn, type, queue, due, ivl, factor, reps, lapses, left, odue, odid, flags, data)
-                VALUES (?, ?, ?, 0, ?, -1, 0, -1, ?, 0, 0, 0, 0, 0, 0, 0, 0, '')
-            ''', (
+            cards_rows.append((
                 card_id,
                 note_id,
                 deck_id,
-                int(time.time()),
+                now,
                 i + 1
             ))
+    
+    cursor.executemany(INSERT_NOTE_SQL, notes_rows)
+    cursor.executemany(INSERT_CARD_SQL, cards_rows)
 
 if __name__ == '__main__':
     import argparse
@@ -6,6 +6,12 @@ import re
 import time
 from pathlib import Path
 
+TAG_RE = re.compile(r'<[^>]+>')
+
+def normalize_front(front):
+    word = front.strip()
+    return TAG_RE.sub('', word).strip() if '<' in word else word
+
 
 def get_english_deck_id(conn):
     cursor = conn.cursor()
@@ -18,20 +24,33 @@ def get_english_deck_id(conn):
         return None
 
 def find_and_update_cards(conn, word_to_source, english_deck_id):
+    conn.create_function("normalize_front", 1, normalize_front)
     cursor = conn.cursor()
     
+    cursor.execute("CREATE TEMP TABLE target_words (word TEXT PRIMARY KEY)")
+    cursor.executemany("INSERT INTO target_words VALUES (?)", [(word,) for word in word_to_source])
+    
     cursor.execute("""
-        SELECT c.id, c.nid, c.queue, n.flds 
-        FROM cards c 
-        JOIN notes n ON c.nid = n.id 
-        WHERE c.did = ?
+        SELECT id, nid, queue, flds
+        FROM (
+            SELECT c.id, c.nid, c.queue, n.flds,
+                   substr(n.flds, 1, instr(n.flds || char(31), char(31)) - 1) AS front
+            FROM cards c 
+            JOIN notes n ON c.nid = n.id 
+            WHERE c.did = ?
+        )
+        WHERE normalize_front(front) IN (SELECT word FROM target_words)
     """, (english_deck_id,))
     
     cards = cursor.fetchall()
-    print(f"Found {len(cards)} cards in English deck")
+    cursor.execute("DROP TABLE temp.target_words")
+    print(f"Found {len(cards)} matching cards in English deck")
     
     updated_count = 0
     found_words = set()
+    unsuspended_cards = []
+    updated_notes = []
+    now = int(time.time())
     
     for card_id, note_id, queue, fields in cards:
         field_list = fields.split('\x1f')
@@ -39,25 +58,26 @@ def find_and_update_cards(conn, word_to_source, english_deck_id):
         if len(field_list) == 0:
             continue
             
-        word = field_list[0].strip()
-        word_clean = re.sub(r'<[^>]+>', '', word).strip()
+        word_clean = normalize_front(field_list[0])
         
         if word_clean in word_to_source:
             found_words.add(word_clean)
             source = word_to_source[word_clean]
             
             if queue == -1:
-                cursor.execute("UPDATE cards SET queue = 0 WHERE id = ?", (card_id,))
+                unsuspended_cards.append((card_id,))
                 print(f"Unsuspended card for word: {word_clean}")
             
             if source and len(field_list) > 1:
                 field_list[-1] = source
                 updated_fields = '\x1f'.join(field_list)
-                cursor.execute("UPDATE notes SET flds = ?, mod = ? WHERE id = ?", 
-                             (updated_fields, int(time.time()), note_id))
+                updated_notes.append((updated_fields, now, note_id))
                 print(f"Updated source for word: {word_clean} -> {source}")
                 updated_count += 1
     
+    cursor.executemany("UPDATE cards SET queue = 0 WHERE id = ?", unsuspended_cards)
+    cursor.executemany("UPDATE notes SET flds = ?, mod = ? WHERE id = ?", updated_notes)
+    
     not_found = set(word_to_source.keys()) - found_words
     if not_found:
         print(f"\nWords not found in deck ({len(not_found)}):")
@@ -2,26 +2,86 @@
 
 import json
 import csv
+import gzip
+import heapq
+import io
+import os
 import re
+import sys
+from collections import defaultdict
+from multiprocessing import Pool
+from operator import itemgetter
 from pathlib import Path
+from typing import NamedTuple
 from urllib.parse import urlparse
 import argparse
 
-def load_frequency_data_for_words(word_set, frequency_file="frequency-all.txt"):
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+FIELDNAMES = [
+    'Front', 'Back', 'Part of Speech', 'IPA', 'Audio',
+    'Etymology', 'Forms', 'Hyphenation', 'Tags', 'Frequency'
+]
+
+class Card(NamedTuple):
+    front: str
+    back: str
+    pos: str
+    ipa: str
+    audio: str
+    etymology: str
+    forms: str
+    hyphenation: str
+    tags: str
+    frequency: str
+
+NEWLINES_RE = re.compile(r'\n+')
+
+ENGLISH_MARKER = b'"English"'
+
+FREQUENCY_FILE = "frequency-all.txt"
+
+AUDIO_TEMPLATE = '<div><strong>{0}:</strong><br> <audio controls><source src="{1}" type="audio/mpeg">🔊 <a href="{1}" target="_blank">Audio</a></audio></div>'
+
+def is_compressed(path):
+    return str(path).endswith(('.gz', '.zst'))
+
+def open_jsonl(path):
+    path = str(path)
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    if path.endswith('.zst'):
+        if zstandard is None:
+            raise RuntimeError(f"Reading {path} requires the zstandard package (pip install zstandard)")
+        return io.BufferedReader(zstandard.open(path, 'rb'), buffer_size=1 << 20)
+    return open(path, 'rb')
+
+def load_frequency_data_for_words(word_set, frequency_file=FREQUENCY_FILE):
+    return read_frequency_file({word.lower() for word in word_set}, frequency_file)
+
+def read_frequency_file(word_set, frequency_file):
     frequency_dict = {}
     try:
-        with open(frequency_file, 'r', encoding='utf-8') as f:
+        with open(frequency_file, 'r', encoding='utf-8', buffering=1 << 20) as f:
             for line in f:
                 if line.startswith('#'):
                     continue
-                parts = line.strip().split()
+                parts = line.split(None, 2)
                 if len(parts) >= 2:
                     try:
                         rank = int(parts[0])
-                        word = parts[1]
-                        if word in word_set or word.lower() in word_set:
-                            frequency_dict[word] = rank
-                            frequency_dict[word.lower()] = rank
+                        word_lower = parts[1].lower()
+                        if word_lower in word_set:
+                            frequency_dict[word_lower] = rank
                     except ValueError:
                         continue
     except FileNotFoundError:
@@ -31,24 +91,41 @@ def load_frequency_data_for_words(word_set, frequency_file="frequency-all.txt"):
 def get_frequency_rank(word, frequency_dict):
     if not frequency_dict:
         return ""
-    rank = frequency_dict.get(word) or frequency_dict.get(word.lower())
+    rank = frequency_dict.get(word.lower())
     if rank:
         return str(rank)
     return ""
 
+def strip_tags(text):
+    parts = []
+    position = 0
+    start = text.find('<')
+    while start >= 0:
+        end = text.find('>', start + 1)
+        if end < 0:
+            break
+        if end > start + 1:
+            parts.append(text[position:start])
+            position = end + 1
+        start = text.find('<', end)
+    parts.append(text[position:])
+    return ''.join(parts)
+
 def clean_html(text):
     if not text:
         return ""
-    text = re.sub(r'<[^>]+>', '', text)
-    text = re.sub(r'\s+', ' ', text)
-    return text.strip()
+    if '<' in text:
+        text = strip_tags(text)
+    if '  ' in text or not text.isprintable() or text.startswith(' ') or text.endswith(' '):
+        text = ' '.join(text.split())
+    return text
 
 def format_etymology(etymology_text):
     if not etymology_text:
         return ""
     etymology = clean_html(etymology_text)
     etymology = etymology.replace("Etymology tree", "")
-    etymology = re.sub(r'\n+', '<br>', etymology)
+    etymology = NEWLINES_RE.sub('<br>', etymology)
     return etymology.strip()
 
 def format_pronunciation(sounds):
@@ -60,7 +137,7 @@ def format_pronunciation(sounds):
     
     for sound in sounds:
         if 'ipa' in sound:
-            tags = sound.get('tags', [])
+            tags = sound['tags'] if 'tags' in sound else ()
             tag_str = f" ({', '.join(tags)})" if tags else ""
             ipa_list.append(f"{sound['ipa']}{tag_str}")
         
@@ -69,7 +146,7 @@ def format_pronunciation(sounds):
             if 'audio' in sound:
                 label = sound['audio'].replace('.ogg', '')
             
-            audio_elements.append(f'<div><strong>{label}:</strong><br> <audio controls><source src="{sound["mp3_url"]}" type="audio/mpeg">🔊 <a href="{sound["mp3_url"]}" target="_blank">Audio</a></audio></div>')
+            audio_elements.append(AUDIO_TEMPLATE.format(label, sound['mp3_url']))
     
     ipa_text = '<br>'.join(ipa_list)
     audio_text = ''.join(audio_elements)
@@ -118,10 +195,11 @@ def format_forms(forms):
     
     form_list = []
     for form in forms:
-        form_text = form.get('form', '')
-        tags = form.get('tags', [])
-        if form_text and tags:
-            form_list.append(f"{form_text} ({', '.join(tags)})")
+        if 'form' in form and 'tags' in form:
+            form_text = form['form']
+            tags = form['tags']
+            if form_text and tags:
+                form_list.append(f"{form_text} ({', '.join(tags)})")
     
     return '; '.join(form_list)
 
@@ -151,35 +229,35 @@ def process_entry(entry):
     if lang != 'English':
         return None
     
-    pos = entry.get('pos', '')
-    senses = entry.get('senses', [])
+    pos = sys.intern(entry.get('pos') or '')
+    senses = entry.get('senses') or ()
     definitions = format_definitions(senses)
     if not definitions:
         return None
-    sounds = entry.get('sounds', [])
+    sounds = entry.get('sounds') or ()
     ipa, audio = format_pronunciation(sounds)
     
     etymology = format_etymology(entry.get('etymology_text', ''))
     
-    forms = format_forms(entry.get('forms', []))
+    forms = format_forms(entry.get('forms') or ())
     
     translations = ""
     
-    hyphenation = entry.get('hyphenation', [])
+    hyphenation = entry.get('hyphenation') or ()
     hyphen_text = '-'.join(hyphenation) if hyphenation else ""
     
-    return {
-        'Front': word,
-        'Back': definitions,
-        'Part of Speech': pos,
-        'IPA': ipa,
-        'Audio': audio,
-        'Etymology': etymology,
-        'Forms': forms,
-        'Hyphenation': hyphen_text,
-        'Tags': f"wiktionary {pos}" if pos else "wiktionary",
-        'Frequency': ''
-    }
+    return Card(
+        front=word,
+        back=definitions,
+        pos=pos,
+        ipa=ipa,
+        audio=audio,
+        etymology=etymology,
+        forms=forms,
+        hyphenation=hyphen_text,
+        tags=sys.intern(f"wiktionary {pos}") if pos else "wiktionary",
+        frequency=''
+    )
 
 def combine_entries(entries_dict):
     combined_cards = {}
@@ -193,32 +271,29 @@ def combine_entries(entries_dict):
             'Front': word,
             'Back': '',
             'Part of Speech': '',
-            'IPA': first_entry.get('IPA', ''),
-            'Audio': first_entry.get('Audio', ''),
-            'Etymology': first_entry.get('Etymology', ''),
+            'IPA': first_entry.ipa,
+            'Audio': first_entry.audio,
+            'Etymology': first_entry.etymology,
             'Forms': '',
-            'Hyphenation': first_entry.get('Hyphenation', ''),
+            'Hyphenation': first_entry.hyphenation,
             'Tags': 'wiktionary',
             'Frequency': ''
         }
         
-        pos_definitions = {}
+        pos_definitions = defaultdict(list)
         all_pos = []
         all_forms = []
         
         for entry in entries:
-            pos = entry.get('Part of Speech', 'Unknown')
-            back = entry.get('Back', '')
-            forms = entry.get('Forms', '')
+            pos = entry.pos
+            back = entry.back
+            forms = entry.forms
             
             if pos and pos not in all_pos:
                 all_pos.append(pos)
             
             if pos and back:
-                if pos in pos_definitions:
-                    pos_definitions[pos] += f"<br>{back}"
-                else:
-                    pos_definitions[pos] = back
+                pos_definitions[pos].append(back)
             
             if forms and forms not in all_forms:
                 all_forms.append(forms)
@@ -226,7 +301,7 @@ def combine_entries(entries_dict):
         combined_back = []
         for pos in all_pos:
             if pos in pos_definitions:
-                combined_back.append(f"<strong>{pos}:</strong><br>{pos_definitions[pos]}")
+                combined_back.append(f"<strong>{pos}:</strong><br>" + '<br>'.join(pos_definitions[pos]))
         
         combined['Back'] = '<br><br>'.join(combined_back)
         combined['Part of Speech'] = ', '.join(all_pos)
@@ -237,6 +312,56 @@ def combine_entries(entries_dict):
     
     return combined_cards
 
+def split_file(path, count):
+    size = os.path.getsize(path)
+    step = max(1, -(-size // max(1, count)))
+    return [(path, start, min(start + step, size)) for start in range(0, size, step)]
+
+def iter_chunk_lines(path, start, end):
+    with open(path, 'rb') as f:
+        position = start
+        if start > 0:
+            f.seek(start - 1)
+            position += len(f.readline()) - 1
+        
+        while position < end:
+            line = f.readline()
+            if not line:
+                break
+            yield position, line
+            position += len(line)
+
+def convert_lines(lines, location, limit=None, report_progress=False):
+    processed_count = 0
+    cards = []
+    
+    for line_id, line in lines:
+        if limit and processed_count >= limit:
+            break
+        
+        try:
+            entry = json_loads(line) if ENGLISH_MARKER in line else None
+            processed_count += 1
+            
+            if report_progress and processed_count % 10000 == 0:
+                print(f"Processed {processed_count} entries...")
+            
+            card_data = process_entry(entry) if entry is not None else None
+            if card_data:
+                cards.append(card_data)
+            
+        except json.JSONDecodeError as e:
+            print(f"Error parsing {location.format(line_id)}: {e}")
+            continue
+        except Exception as e:
+            print(f"Error processing entry on {location.format(line_id)}: {e}")
+            continue
+    
+    return processed_count, cards
+
+def convert_chunk(chunk):
+    return convert_lines(iter_chunk_lines(*chunk), "line at byte {}")
+
 def main():
     parser = argparse.ArgumentParser(description='Convert Wiktionary JSONL to Anki CSV')
     parser.add_argument('input_file', help='Input JSONL file from kaikki.org')
@@ -246,6 +371,8 @@ def main():
                        help='Limit number of entries to process (for testing)')
     parser.add_argument('--min-def-length', type=int, default=0,
                        help='Minimum definition length to include')
+    parser.add_argument('-j', '--jobs', type=int,
+                       help='Number of worker processes (default: CPU count)')
     
     args = parser.parse_args()
     
@@ -256,73 +383,56 @@ def main():
     
     output_path = Path(args.output)
     
-    fieldnames = [
-        'Front', 'Back', 'Part of Speech', 'IPA', 'Audio', 
-        'Etymology', 'Forms', 'Hyphenation', 'Tags', 'Frequency'
-    ]
-    processed_count = 0
-    entries_by_word = {}
+    entries_by_word = defaultdict(list)
     
     print(f"Processing {args.input_file}...")
     print(f"Output will be written to {args.output}")
     
-    with open(input_path, 'r', encoding='utf-8') as infile:
-        for line_num, line in enumerate(infile, 1):
-            if args.limit and processed_count >= args.limit:
-                break
-                
-            try:
-                entry = json.loads(line.strip())
-                processed_count += 1
-                
-                if processed_count % 10000 == 0:
-                    print(f"Processed {processed_count} entries...")
-                
-                card_data = process_entry(entry)
-                if card_data:
-                    word = card_data['Front']
-                    if word not in entries_by_word:
-                        entries_by_word[word] = []
-                    entries_by_word[word].append(card_data)
-                
-            except json.JSONDecodeError as e:
-                print(f"Error parsing line {line_num}: {e}")
-                continue
-            except Exception as e:
-                print(f"Error processing entry on line {line_num}: {e}")
-                continue
+    if args.limit or is_compressed(input_path):
+        with open_jsonl(input_path) as infile:
+            processed_count, cards = convert_lines(enumerate(infile, 1), "line {}", args.limit, True)
+        for card_data in cards:
+            entries_by_word[card_data.front].append(card_data)
+    else:
+        processed_count = 0
+        chunks = split_file(input_path, (args.jobs or os.cpu_count() or 1) * 4)
+        with Pool(args.jobs) as pool:
+            for chunk_count, cards in pool.imap(convert_chunk, chunks):
+                processed_count += chunk_count
+                for card_data in cards:
+                    entries_by_word[card_data.front].append(card_data)
+                print(f"Processed {processed_count} entries...")
     
     print("Combining entries by word...")
     combined_cards = combine_entries(entries_by_word)
     
     print("Loading frequency data for found words...")
-    frequency_dict = load_frequency_data_for_words(set(combined_cards.keys()))
+    lowercase_words = {word: word.lower() for word in combined_cards}
+    frequency_dict = read_frequency_file(set(lowercase_words.values()), FREQUENCY_FILE)
     
-    print("Adding frequency data...")
-    for word, card_data in combined_cards.items():
-        card_data['Frequency'] = get_frequency_rank(word, frequency_dict)
-
     print("Sorting by frequency...")
-    sorted_cards = []
+    candidates = []
     for word, card_data in combined_cards.items():
         if len(card_data['Back']) >= args.min_def_length:
-            freq = frequency_dict.get(word.lower())
+            freq = frequency_dict.get(lowercase_words[word])
             if freq is not None:  # Only include words with actual frequency data
-                sorted_cards.append((freq, word, card_data))
-    sorted_cards.sort(key=lambda x: x[0])
+                candidates.append((freq, word, card_data))
     max_cards = 1000000
-    top_cards = sorted_cards[:max_cards]
+    if len(candidates) > max_cards:
+        top_cards = heapq.nsmallest(max_cards, candidates, key=itemgetter(0))
+    else:
+        top_cards = sorted(candidates, key=itemgetter(0))
     print(f"Selected top {len(top_cards)} cards by frequency")
 
-    written_count = 0
-    with open(output_path, 'w', newline='', encoding='utf-8') as outfile:
-        writer = csv.DictWriter(outfile, fieldnames=fieldnames)
-        writer.writeheader()
-        
-        for rank, (freq, word, card_data) in enumerate(top_cards, 1):
-            card_data['Frequency'] = str(rank)
-            writer.writerow(card_data)
-            written_count += 1
+    for rank, (freq, word, card_data) in enumerate(top_cards, 1):
+        card_data['Frequency'] = str(rank)
+    
+    card_row = itemgetter(*FIELDNAMES)
+    with open(output_path, 'w', newline='', encoding='utf-8', buffering=1 << 20) as outfile:
+        writer = csv.writer(outfile)
+        writer.writerow(FIELDNAMES)
+        writer.writerows(card_row(card_data) for freq, word, card_data in top_cards)
+    written_count = len(top_cards)
     
     print(f"\nCompleted!")
     print(f"Processed: {processed_count} entries")